@@ -1,3 +1,5 @@
+import os
+
 project = 'Jupyter Format'
 author = 'Matthias Geier'
 
@@ -70,15 +72,40 @@ nbsphinx_epilog = jinja_define + r"""
 
 # -- Get version information and date from Git ----------------------------
 
+# Running "git" on every (incremental) build is slow, therefore the results
+# are cached.  The reflog of HEAD changes on every commit and checkout,
+# the tags directory (or packed-refs) whenever a new tag is added.
+
+git_cache = os.path.join('_build', '.gitcache')
+try:
+    git_signature = ' '.join(
+        str(os.stat(p).st_mtime_ns) if os.path.exists(p) else '-'
+        for p in ['../.git/refs/tags', '../.git/packed-refs'])
+    git_signature += ' ' + str(os.stat('../.git/logs/HEAD').st_mtime_ns)
+except OSError:
+    git_signature = None
+
 try:
-    from subprocess import check_output
-    release = check_output(['git', 'describe', '--tags', '--always'])
-    release = release.decode().strip()
-    today = check_output(['git', 'show', '-s', '--format=%ad', '--date=short'])
-    today = today.decode().strip()
+    with open(git_cache, encoding='utf-8') as f:
+        cached_signature, release, today = f.read().splitlines()
+    if cached_signature != git_signature:
+        raise ValueError('Git cache is outdated')
 except Exception:
-    release = '<unknown>'
-    today = '<unknown date>'
+    try:
+        from subprocess import check_output
+        release = check_output(['git', 'describe', '--tags', '--always'])
+        release = release.decode().strip()
+        today = check_output(
+            ['git', 'show', '-s', '--format=%ad', '--date=short'])
+        today = today.decode().strip()
+    except Exception:
+        release = '<unknown>'
+        today = '<unknown date>'
+    else:
+        if git_signature:
+            os.makedirs('_build', exist_ok=True)
+            with open(git_cache, 'w', encoding='utf-8') as f:
+                f.write('\n'.join([git_signature, release, today]) + '\n')
 
 # -- Options for HTML output ----------------------------------------------
 
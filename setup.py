@@ -1,17 +1,37 @@
+import ast
+
 from setuptools import setup
 
 # "import" __version__
 __version__ = 'unknown'
-for line in open('src/jupyter_format/__init__.py'):
-    if line.startswith('__version__'):
-        exec(line)
-        break
+with open('src/jupyter_format/__init__.py') as f:
+    for node in ast.parse(f.read()).body:
+        if (isinstance(node, ast.Assign) and
+                [getattr(t, 'id', None) for t in node.targets] ==
+                ['__version__']):
+            __version__ = ast.literal_eval(node.value)
+            break
+
+# The parser and the writer are optionally compiled if Cython is available
+# at build time
+try:
+    from Cython.Build import cythonize
+except ImportError:
+    ext_modules = []
+else:
+    ext_modules = cythonize(
+        ['src/jupyter_format/_reader.py', 'src/jupyter_format/_writer.py'],
+        compiler_directives={'language_level': 3})
+    # If compilation fails (e.g. without a C compiler), the .py files are used
+    for ext in ext_modules:
+        ext.optional = True
 
 setup(
     name='jupyter_format',
     version=__version__,
     package_dir={'': 'src'},
     packages=['jupyter_format'],
+    ext_modules=ext_modules,
     install_requires=['nbformat'],
     python_requires='>=3.4',
     author='Matthias Geier',
@@ -9,13 +9,25 @@ class ParseError(Exception):
 
     This reports the line number where the error occured.
 
+    :param msg: Error message, available as :attr:`msg`.
+    :param lineno: Line number, available as :attr:`lineno`.
+        If not given, it is filled in by :func:`deserialize`.
+    :param offset: Number of lines to go back from the current line
+        when :func:`deserialize` fills in the line number.
+
     """
 
+    def __init__(self, msg, lineno=None, offset=0):
+        super().__init__(msg)
+        self.msg = msg
+        self.lineno = lineno
+        self.offset = offset
+
     def __str__(self):
-        if len(self.args) == 2:
-            return 'Line {1}: {0}'.format(*self.args)
-        return super().__str__()
+        if self.lineno is None:
+            return self.msg
+        return 'Line {}: {}'.format(self.lineno, self.msg)
 
 
 from ._reader import deserialize
-from ._writer import generate_lines, serialize
+from ._writer import generate_lines, serialize, serialize_to
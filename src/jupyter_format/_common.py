@@ -1,4 +1,11 @@
+import functools
 import re
 
 # Regular expression from nbformat JSON schema:
 RE_JSON = re.compile('^application/(.*\\+)?json$')
+
+
+@functools.lru_cache(maxsize=256)
+def is_json_mime(mime_type):
+    # NB: The same few MIME types are used over and over again
+    return RE_JSON.match(mime_type) is not None
@@ -1,11 +1,26 @@
 """Functions for reading Jupyter files."""
 import json
-import re
 
 import nbformat
 
 from . import ParseError
-from ._common import RE_JSON
+from ._common import is_json_mime
+
+# Indentation prefixes, indexed by number of spaces:
+PREFIXES = tuple(' ' * n for n in range(5))
+
+# Empty cells created (and validated) by nbformat, copied by new_cell():
+MARKDOWN_CELL = nbformat.v4.new_markdown_cell()
+CODE_CELL = nbformat.v4.new_code_cell()
+RAW_CELL = nbformat.v4.new_raw_cell()
+
+# Cell header lines without additional information:
+CELL_TEMPLATES = {
+    'markdown': MARKDOWN_CELL,
+    'code': CODE_CELL,
+    'code ': CODE_CELL,
+    'raw': RAW_CELL,
+}
 
 
 def deserialize(source):
@@ -14,10 +29,14 @@ def deserialize(source):
     Lines have to be terminated with ``'\\n'``
     (a.k.a.  :term:`universal newlines` mode).
 
-    If *source* is an iterable, line terminators may be omitted.
+    If *source* is an iterable (e.g. a file object opened in text
+    mode), line terminators may be omitted.
+
+    If *source* is a :class:`bytes` object (e.g. the raw content of a
+    file opened in binary mode), it is decoded as UTF-8.
 
     :param source: Content of ``.jupyter`` file.
-    :type source: str or iterable of str
+    :type source: str or bytes or iterable of str
     :returns: A notebook node.
     :rtype: nbformat.NotebookNode
 
@@ -26,12 +45,9 @@ def deserialize(source):
     try:
         nb = parse(lines)
     except ParseError as e:
-        if len(e.args) == 1:
-            # Add line number
-            e.args += lines.current,
-        elif len(e.args) == 2:
-            # Apply line number offset
-            e.args = e.args[0], lines.current - e.args[1]
+        if e.lineno is None:
+            # Add line number (with optional offset)
+            e.lineno = lines.current - e.offset
         raise e
     except Exception as e:
         raise ParseError(type(e).__name__ + ': ' + str(e), lines.current)
@@ -42,14 +58,12 @@ def parse(lines):
     nb = header(lines)
 
     for line in lines:
-        if word('markdown', line):
-            cell = nbformat.v4.new_markdown_cell()
+        template = CELL_TEMPLATES.get(line)
+        if template is not None:
+            cell = new_cell(template)
         elif line.startswith('code'):
-            cell = nbformat.v4.new_code_cell()
-            if line not in ('code', 'code '):
-                cell.execution_count = word_plus_integer('code', line)
-        elif word('raw', line):
-            cell = nbformat.v4.new_raw_cell()
+            cell = new_cell(CODE_CELL)
+            cell.execution_count = word_plus_integer('code', line)
         elif word('notebook_metadata', line):
             nb.metadata = metadata(lines)
             for _ in lines:
@@ -58,6 +72,9 @@ def parse(lines):
                     'and no subsequent lines are allowed')
             break
         else:
+            # NB: These raise an error if there is text after the cell type
+            word('markdown', line)
+            word('raw', line)
             raise ParseError(
                 "Expected (unindented) cell type or 'notebook_metadata', "
                 "got {!r}".format(line))
@@ -79,6 +96,19 @@ def parse(lines):
     return nb
 
 
+def new_cell(template):
+    # NB: nbformat.v4.new_*_cell() validates each new cell against the
+    #     JSON schema, which takes much longer than parsing the cell.
+    cell = nbformat.NotebookNode(template)
+    cell.metadata = nbformat.NotebookNode()
+    if 'id' in cell:
+        # Since nbformat 5.1
+        cell.id = nbformat.v4.nbbase.random_cell_id()
+    if 'outputs' in cell:
+        cell.outputs = []
+    return cell
+
+
 def header(lines):
     nb = nbformat.v4.new_notebook()
 
@@ -112,26 +142,28 @@ def attachment(line, lines, cell):
 
 def code_output(line, lines, cell):
     kwargs = {}
-    if line.startswith('stream'):
-        output_type = 'stream'
+    output_type = line.partition(' ')[0]
+    if output_type == 'stream':
         # NB: "name" is required!
         kwargs['name'] = word_plus_string('stream', line)
         kwargs['text'] = indented_block(lines)
-    elif (word('display_data', line) or
-            word('execute_result', line)):
-        output_type = line
+    elif output_type in ('display_data', 'execute_result'):
+        # NB: This raises an error if there is text after the output type
+        word(output_type, line)
+        kwargs['metadata'] = {}
+        kwargs['data'] = mime_bundle(lines)
         if output_type == 'execute_result':
             kwargs['execution_count'] = cell.execution_count
-        kwargs['data'] = mime_bundle(lines)
         for line in indented(2, lines):
             if not word('output_metadata', line):
                 raise ParseError(
                     "Only 'output_metadata' is allowed here, not {!r}"
                     .format(line))
             kwargs['metadata'] = metadata(lines)
+            if not isinstance(kwargs['metadata'], dict):
+                raise ParseError('Output metadata must be a JSON object')
             break
-    elif line.startswith('error'):
-        output_type = 'error'
+    elif output_type == 'error':
         # NB: All fields are required
         kwargs['ename'] = word_plus_string('error', line)
         # TODO: check for non-empty?
@@ -142,7 +174,10 @@ def code_output(line, lines, cell):
             'Expected output type, got {!r}'.format(line))
     for line in indented(2, lines):
         raise ParseError('Invalid output data: {!r}'.format(line))
-    out = nbformat.v4.new_output(output_type, **kwargs)
+    # NB: Like in new_cell(), nbformat.v4.new_output() is avoided
+    #     because of its schema validation.
+    out = nbformat.NotebookNode(output_type=output_type)
+    out.update(kwargs)
     cell.outputs.append(out)
 
 
@@ -175,14 +210,15 @@ def mime_bundle(lines):
             # TODO: better error message?
             raise ParseError('Invalid MIME type: {!r}'.format(mime_type))
         # TODO: check for repeated MIME type?
-        content = indented_block(lines)
-        if content:
-            content += '\n'
-        if RE_JSON.match(mime_type):
-            bundle[mime_type] = parse_json(content)
+        if is_json_mime(mime_type):
+            bundle[mime_type] = parse_json(indented_block(lines))
         else:
-            if content and content.endswith('\n') and content.strip('\n'):
-                content = content[:-1]
+            start = lines.current
+            content = indented_block(lines)
+            if (content[:1] == '\n' and not content.strip('\n') or
+                    not content and lines.current > start):
+                # Only blank lines: each of them stands for one newline
+                content += '\n'
             bundle[mime_type] = content
     return bundle
 
@@ -197,24 +233,43 @@ def parse_json(text):
     try:
         data = json.loads(text)
     except json.JSONDecodeError as e:
-        # Abuse JSONDecodeError constructor to calculate number of lines:
-        total = json.JSONDecodeError('', text, -1).lineno
+        # Number of lines after the error line (the last line of the text
+        # is the current line).  NB: Only the text after the error is
+        # scanned, the json module has already counted the rest.
+        offset = text.count('\n', e.pos)
         raise ParseError(
             'JSON error in column {}: {}'.format(e.colno + 4, e.msg),
-            total - e.lineno + 1)
+            offset=offset)
     return data
 
 
 def indented_block(lines):
-    return '\n'.join(indented(4, lines))
+    # NB: This is the same as '\n'.join(indented(4, lines)), but it is
+    #     by far the most frequently used case, so it is done in one loop.
+    source = lines.lines
+    current = lines.current
+    block = []
+    while current < len(source):
+        line = source[current]
+        if line[:4] == '    ':
+            block.append(line[4:])
+        elif not line or line.isspace():
+            block.append('')  # Blank line
+        else:
+            break
+        current += 1
+    lines.current = current
+    return '\n'.join(block)
 
 
 def word_plus_integer(word, line):
-    m = re.match(word + ' ([0-9]|[1-9][0-9]+)$', line)
-    if not m:
+    prefix, _, number = line.partition(' ')
+    # NB: str.isdigit() would also accept non-ASCII digits
+    if (prefix != word or not number or number.strip('0123456789') or
+            (number[0] == '0' and len(number) > 1)):
         raise ParseError(
             'Expected {!r} followed by a space and an integer'.format(word))
-    return int(m.group(1))
+    return int(number)
 
 
 def word_plus_string(word, line):
@@ -227,50 +282,52 @@ def word_plus_string(word, line):
 
 
 def word(word, line):
-    if line.startswith(word):
-        if line != word:
-            raise ParseError('No text allowed after {!r}'.format(word))
+    if line == word:
         return True
-    else:
-        return False
+    if line.startswith(word):
+        raise ParseError('No text allowed after {!r}'.format(word))
+    return False
 
 
 class SourceLines:
     """Iterator over source lines.
 
-    Strips trailing newlines, tracks current line number, allows peeking.
+    Strips trailing newlines, tracks current line number.
+
+    The lines are stored in a list, which makes accessing and advancing
+    a matter of indexing and incrementing :attr:`current`.
 
     """
 
     def __init__(self, source):
+        if isinstance(source, (bytes, bytearray)):
+            try:
+                source = source.decode('utf-8')
+            except UnicodeDecodeError as e:
+                # NB: Lines are counted like below, with str.splitlines().
+                #     A character is appended to count the error line.
+                prefix = source[:e.start].decode('utf-8') + '_'
+                raise ParseError(
+                    'Invalid UTF-8 data: ' + e.reason,
+                    len(prefix.splitlines()))
         if isinstance(source, str):
-            source = source.splitlines()
-        self._iter = iter(source)
-        self.current = -1
-        self.advance()
-
-    def peek(self):
-        if isinstance(self._next, StopIteration):
-            raise self._next
-        return self._next
-
-    def advance(self):
-        try:
-            line = next(self._iter)
-            if line.endswith('\n'):
-                line = line[:-1]
-            self._next = line
-        except StopIteration as e:
-            self._next = e
-        self.current += 1
+            self.lines = source.splitlines()
+        else:
+            # NB: Comparing a slice avoids a method call for each line
+            self.lines = [
+                line[:-1] if line[-1:] == '\n' else line
+                for line in source]
+        self.current = 0
 
     def __iter__(self):
         return self
 
     def __next__(self):
-        line = self.peek()
-        self.advance()
-        return line
+        current = self.current
+        if current >= len(self.lines):
+            raise StopIteration
+        self.current = current + 1
+        return self.lines[current]
 
 
 def indented(indentation, lines):
@@ -279,16 +336,15 @@ def indented(indentation, lines):
     Blank lines are forwarded as empty lines.
 
     """
-    while True:
-        try:
-            line = lines.peek()
-        except StopIteration:
-            break
-        if line.startswith(' ' * indentation):
+    prefix = PREFIXES[indentation]
+    source = lines.lines
+    while lines.current < len(source):
+        line = source[lines.current]
+        if line[:indentation] == prefix:
             line = line[indentation:]
-        elif not line.strip():
+        elif not line or line.isspace():
             line = ''  # Blank line
         else:
             break
-        lines.advance()
+        lines.current += 1
         yield line
@@ -1,11 +1,27 @@
 """Functions for writing Jupyter files."""
+import io
 import json
 
-from ._common import RE_JSON
+from ._common import is_json_mime
+
+INDENT = ' ' * 4
+
+# Line boundaries (according to str.splitlines()) other than '\n':
+OTHER_LINE_BREAKS = '\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029'
+
+# Options should be the same as in nbformat!
+JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, indent=1, sort_keys=True)
+
+# Number of strings joined for each write() call in serialize_to():
+WRITE_CHUNK_SIZE = 1000
 
 
 def generate_lines(nb):
-    """Generator yielding lines to be written to ``.jupyter`` files.
+    """Return an iterator over lines to be written to ``.jupyter`` files.
+
+    The whole notebook is serialized when this function is called
+    (therefore errors are raised immediately), the resulting text is
+    then split into lines.
 
     Each of the lines has a line separator at the end, therefore it can
     e.g. be used in :meth:`~io.IOBase.writelines`.
@@ -13,30 +29,9 @@ def generate_lines(nb):
     :param nbformat.NotebookNode nb: A notebook node.
 
     """
-    if nb.nbformat != 4:
-        raise RuntimeError('Currently, only notebook version 4 is supported')
-    yield line('', 'nbformat', nb.nbformat)
-    yield line('', 'nbformat_minor', nb.nbformat_minor)
-    for cell in nb.cells:
-        cell_type = cell.cell_type
-        if cell_type == 'code' and cell.execution_count is not None:
-            yield line('', 'code', cell.execution_count)
-        else:
-            yield line('', cell_type)
-        yield from indented_block(cell.source + '\n')
-        if cell_type in ('markdown', 'raw'):
-            # attachments (since v4.1)
-            for name, data in cell.get('attachments', {}).items():
-                yield from attachment(name, data)
-        elif cell_type == 'code':
-            for out in cell.outputs:
-                yield from code_cell_output(out)
-        else:
-            raise RuntimeError('Unknown cell type: {!r}'.format(cell_type))
-        if cell.metadata:
-            yield from json_block(' cell_metadata', cell.metadata)
-    if nb.metadata:
-        yield from json_block('notebook_metadata', nb.metadata)
+    # NB: JSON blocks may contain line boundaries other than '\n' (see
+    #     json_block()), therefore splitlines() can't be used here
+    return iter(io.StringIO(serialize(nb)))
 
 
 def serialize(nb):
@@ -47,73 +42,150 @@ def serialize(nb):
     :rtype: str
 
     """
-    return ''.join(generate_lines(nb))
+    out = []
+    emit(nb, out)
+    return ''.join(out)
 
 
-def attachment(name, data):
-    yield line(' ', 'attachment', name)
-    yield from mime_bundle(data)
+def serialize_to(nb, file):
+    """Write a Jupyter notebook in ``.jupyter`` format to a file.
 
+    In contrast to :func:`serialize`, the whole file content is never
+    stored in a single string.
 
-def code_cell_output(out):
-    if out.output_type == 'stream':
-        # NB: "name" is required!
-        yield line(' ', 'stream', out.name)
-        yield from indented_block(out.text)
-    elif out.output_type in ('display_data', 'execute_result'):
-        yield line(' ', out.output_type)
-        # TODO: check if out.execution_count matches cell.execution_count?
-        if out.data:
-            yield from mime_bundle(out.data)
-        if out.metadata:
-            yield from json_block('  output_metadata', out.metadata)
-    elif out.output_type == 'error':
-        yield line(' ', 'error', out.ename)
-        yield from indented_block(out.evalue)
-        yield line('  ', 'traceback')
-        for i, frame in enumerate(out.traceback):
-            if i:
-                yield '   -\n'
-            for l in frame.splitlines():
-                yield '    ' + l + '\n'
-    else:
-        raise RuntimeError('Unknown output type: {!r}'.format(out.output_type))
-
+    :param nbformat.NotebookNode nb: A notebook node.
+    :param file: A text file opened for writing.
+    :type file: file object
 
-def mime_bundle(data):
-    # TODO: sort MIME types?
-    # TODO: alphabetically, by importance?
-    for k, v in data.items():
-        if RE_JSON.match(k):
-            yield from json_block('   ' + k, v)
-        else:
-            if v.endswith('\n') and v.strip('\n'):
-                v += '\n'
-            yield from text_block('   ' + k, v)
+    """
+    out = []
+    emit(nb, out)
+    # NB: Writing each (typically very short) string separately is slow
+    for i in range(0, len(out), WRITE_CHUNK_SIZE):
+        file.write(''.join(out[i:i + WRITE_CHUNK_SIZE]))
 
 
-def line(prefix, key, value=None):
-    if value is None:
-        return '{}{}\n'.format(prefix, key)
-    else:
-        return '{}{} {}\n'.format(prefix, key, value)
+def emit(nb, out):
+    # NB: Appending to a list is much faster than nested generators
+    if nb.nbformat != 4:
+        raise RuntimeError('Currently, only notebook version 4 is supported')
+    out.append('nbformat 4\nnbformat_minor {}\n'.format(nb.nbformat_minor))
+    for cell in nb.cells:
+        cell_type = cell.cell_type
+        if cell_type == 'code':
+            if cell.execution_count is None:
+                out.append('code\n')
+            else:
+                out.append('code ' + str(cell.execution_count) + '\n')
+            indented_block(cell.source + '\n', out)
+            for output in cell.outputs:
+                code_cell_output(output, out)
+        elif cell_type in ('markdown', 'raw'):
+            out.append(cell_type + '\n')
+            indented_block(cell.source + '\n', out)
+            # attachments (since v4.1)
+            attachments = cell.get('attachments')
+            if attachments:
+                for name, data in attachments.items():
+                    attachment(name, data, out)
+        else:
+            raise RuntimeError('Unknown cell type: {!r}'.format(cell_type))
+        if cell.metadata:
+            json_block(' cell_metadata', cell.metadata, out)
+    if nb.metadata:
+        json_block('notebook_metadata', nb.metadata, out)
 
 
-def text_block(key, value):
-    yield key + '\n'
-    yield from indented_block(value)
+def attachment(name, data, out):
+    out.append(' attachment ' + name + '\n')
+    mime_bundle(data, out)
 
 
-def json_block(key, value):
-    yield key + '\n'
-    yield from indented_block(serialize_json(value))
+def code_cell_output(output, out):
+    # NB: Attribute access on NotebookNode is slow, the type is read only once
+    output_type = output.output_type
+    if output_type == 'stream':
+        # NB: "name" is required!
+        out.append(' stream ' + output.name + '\n')
+        indented_block(output.text, out)
+    elif output_type in ('display_data', 'execute_result'):
+        out.append(' ' + output_type + '\n')
+        # TODO: check if output.execution_count matches cell.execution_count?
+        if output.data:
+            mime_bundle(output.data, out)
+        if output.metadata:
+            json_block('  output_metadata', output.metadata, out)
+    elif output_type == 'error':
+        out.append(' error ' + output.ename + '\n')
+        indented_block(output.evalue, out)
+        out.append('  traceback\n')
+        for i, frame in enumerate(output.traceback):
+            if i:
+                out.append('   -\n')
+            indented_block(frame, out)
+    else:
+        raise RuntimeError(
+            'Unknown output type: {!r}'.format(output_type))
 
 
-def indented_block(text):
-    for l in text.splitlines():
-        yield ' ' * 4 + l + '\n'
+def mime_bundle(data, out):
+    # TODO: sort MIME types?
+    # TODO: alphabetically, by importance?
+    for k, v in data.items():
+        if is_json_mime(k):
+            json_block('   ' + k, v, out)
+        else:
+            text_block('   ' + k, v, out)
+            # NB: The first character is checked to avoid strip() on
+            #     (potentially large) data that doesn't start with a newline
+            if v.endswith('\n') and (v[0] != '\n' or v.strip('\n')):
+                # A trailing newline is marked by an additional blank line
+                out.append(INDENT + '\n')
+
+
+def text_block(key, value, out):
+    out.append(key + '\n')
+    indented_block(value, out)
+
+
+def json_block(key, value, out):
+    # NB: '\r' and all other ASCII control characters are escaped in JSON
+    #     strings, but with ensure_ascii=False, U+0085, U+2028 and U+2029
+    #     are written unescaped.  They are not treated as line breaks here,
+    #     only '\n' is.  Note that str.splitlines() does split at them.
+    out.append(key + '\n' + INDENT)
+    out.append(serialize_json(value).replace('\n', '\n' + INDENT))
+    out.append('\n')
+
+
+def indented_block(text, out):
+    # NB: splitlines() also splits at other line boundaries like '\r'.
+    #     Large blocks without those are indented more quickly with replace().
+    if len(text) > 200:
+        for char in OTHER_LINE_BREAKS:
+            if char in text:
+                break
+        else:
+            out.append(INDENT)
+            newline = text.find('\n')
+            if newline == len(text) - 1:
+                # A single line (e.g. base64 data) doesn't have to be copied
+                out.append(text)
+                return
+            if newline < 0:
+                out.append(text)
+            elif text.endswith('\n'):
+                out.append(text[:-1].replace('\n', '\n' + INDENT))
+            else:
+                out.append(text.replace('\n', '\n' + INDENT))
+            out.append('\n')
+            return
+    lines = text.splitlines()
+    if lines:
+        out.append(INDENT)
+        out.append(('\n' + INDENT).join(lines))
+        out.append('\n')
 
 
 def serialize_json(data):
-    # Options should be the same as in nbformat!
-    return json.dumps(data, ensure_ascii=False, indent=1, sort_keys=True)
+    return JSON_ENCODER.encode(data)
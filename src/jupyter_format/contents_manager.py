@@ -37,4 +37,4 @@ class FileContentsManager(_fm.FileContentsManager):
         with self.atomic_writing(os_path, text=True,
                                  newline=None,  # "universal newlines"
                                  encoding='utf-8') as f:
-            f.writelines(_jf.generate_lines(nb))
+            _jf.serialize_to(nb, f)
@@ -12,6 +12,7 @@ Usage to apply this to the whole history of a Git branch::
     git filter-branch --tree-filter "python3 -m jupyter_format.replace_all --recursive --yes"
 
 """
+import functools
 from pathlib import Path
 import sys
 
@@ -29,13 +30,19 @@ def ipynb_to_jupyter(path):
 
     """
     path = Path(path)
-    exporter = JupyterExporter()
+    exporter, writer = exporter_and_writer()
     nb, resources = exporter.from_filename(str(path))
-    writer = FilesWriter()
     writer.write(nb, resources, notebook_name=path.with_suffix('').name)
     path.unlink()
 
 
+@functools.lru_cache()
+def exporter_and_writer():
+    # NB: Creating an exporter takes a significant fraction of the time
+    #     needed to convert a small notebook, so it is done once per process
+    return JupyterExporter(), FilesWriter()
+
+
 def replace_all_recursive(start_dir, mapfunction=map):
     """Replace all ``.ipynb`` files recursively.
 
@@ -0,0 +1,51 @@
+from jupyter_format import deserialize, ParseError
+import pytest
+
+
+def test_bytes_source():
+    nb = deserialize(
+        'nbformat 4\nnbformat_minor 1\nmarkdown\n    ä\n'.encode())
+    assert nb.cells[0].source == 'ä'
+
+
+def test_invalid_utf8():
+    with pytest.raises(ParseError) as excinfo:
+        deserialize(b'nbformat 4\nnbformat_minor 1\nmarkdown\n    \xff\n')
+    assert str(excinfo.value).startswith('Line 4: Invalid UTF-8')
+
+
+def test_invalid_utf8_other_line_breaks():
+    with pytest.raises(ParseError) as excinfo:
+        deserialize(b'nbformat 4\rnbformat_minor 1\rraw\r    \xc3\r')
+    assert str(excinfo.value).startswith('Line 4: Invalid UTF-8')
+
+
+def test_output_metadata_not_an_object():
+    with pytest.raises(ParseError) as excinfo:
+        deserialize('nbformat 4\nnbformat_minor 1\ncode\n display_data\n'
+                    '   text/plain\n    x\n  output_metadata\n    [1]\n')
+    assert str(excinfo.value) == \
+        'Line 8: Output metadata must be a JSON object'
+
+
+JSON_WITH_ERROR = '    {\n     "a": 1,\n     "b": ,\n     "c": 3\n    }\n'
+
+
+@pytest.mark.parametrize('source, lineno', [
+    ('markdown\n cell_metadata\n' + JSON_WITH_ERROR, 7),
+    ('markdown\n cell_metadata\n' + JSON_WITH_ERROR + '\n\n', 7),
+    ('code\n display_data\n   application/json\n' + JSON_WITH_ERROR, 8),
+])
+def test_json_error(source, lineno):
+    with pytest.raises(ParseError) as excinfo:
+        deserialize('nbformat 4\nnbformat_minor 1\n' + source)
+    assert str(excinfo.value) == \
+        'Line {}: JSON error in column 11: Expecting value'.format(lineno)
+
+
+def test_parse_error_attributes():
+    with pytest.raises(ParseError) as excinfo:
+        deserialize('nbformat 4\nnbformat_minor 1\nmarkdown x\n')
+    assert excinfo.value.lineno == 3
+    assert excinfo.value.msg == "No text allowed after 'markdown'"
+    assert str(excinfo.value) == "Line 3: No text allowed after 'markdown'"
@@ -1,4 +1,6 @@
-from jupyter_format import serialize
+import io
+
+from jupyter_format import deserialize, generate_lines, serialize, serialize_to
 import nbformat
 import pytest
 
@@ -13,6 +15,20 @@ def test_minimal_notebook(nb):
     assert serialize(nb) == 'nbformat 4\nnbformat_minor 1\n'
 
 
+def test_generate_lines(nb):
+    nb.cells.append(nbformat.v4.new_markdown_cell('one\ntwo'))
+    lines = list(generate_lines(nb))
+    assert lines[-3:] == ['markdown\n', '    one\n', '    two\n']
+    assert ''.join(lines) == serialize(nb)
+
+
+def test_serialize_to(nb):
+    nb.cells.append(nbformat.v4.new_code_cell('42'))
+    file = io.StringIO()
+    serialize_to(nb, file)
+    assert file.getvalue() == serialize(nb)
+
+
 def test_only_version_4_is_allowed(nb):
     nb.nbformat = 5
     with pytest.raises(RuntimeError) as excinfo:
@@ -27,3 +43,59 @@ def test_unknown_cell_type(nb):
     with pytest.raises(RuntimeError) as excinfo:
         serialize(nb)
     assert "'nonsense'" in str(excinfo.value)
+
+
+def test_line_separator_in_metadata(nb):
+    # NB: U+2028 is not escaped in JSON, but it's not a line break here
+    nb.metadata.key = 'a\u2028b'
+    lines = list(generate_lines(nb))
+    assert lines[-4:] == [
+        'notebook_metadata\n', '    {\n', '     "key": "a\u2028b"\n',
+        '    }\n']
+    assert ''.join(lines) == serialize(nb)
+    # NB: An iterable of lines is read without splitting them again
+    assert deserialize(lines).metadata == nb.metadata
+
+
+# NB: Texts longer than 200 characters are indented with str.replace()
+LONG = 'x' * 250
+
+
+@pytest.mark.parametrize('text, expected', [
+    (LONG, ['    ' + LONG]),
+    (LONG + '\n', ['    ' + LONG]),
+    (LONG + '\nabc', ['    ' + LONG, '    abc']),
+    (LONG + '\nabc\n', ['    ' + LONG, '    abc']),
+    (LONG + '\n\nabc\n', ['    ' + LONG, '    ', '    abc']),
+    # '\r' is a line break for splitlines(), so it is used instead
+    (LONG + '\rabc\n', ['    ' + LONG, '    abc']),
+])
+def test_long_stream_output(nb, text, expected):
+    cell = nbformat.v4.new_code_cell()
+    cell.outputs.append(
+        nbformat.v4.new_output('stream', name='stdout', text=text))
+    nb.cells.append(cell)
+    lines = serialize(nb).split('\n')
+    assert lines[-len(expected) - 2:] == [' stream stdout'] + expected + ['']
+
+
+def test_long_single_line_mime_data(nb):
+    data = 'A' * 500 + '\n'  # e.g. base64-encoded image
+    cell = nbformat.v4.new_code_cell()
+    cell.outputs.append(
+        nbformat.v4.new_output('display_data', data={'image/png': data}))
+    nb.cells.append(cell)
+    text = serialize(nb)
+    assert text.endswith(
+        '   image/png\n    ' + 'A' * 500 + '\n    \n')
+    assert deserialize(text).cells[0].outputs[0].data['image/png'] == data
+
+
+@pytest.mark.parametrize('data', ['abc\n', 'abc', '\n', '\n\n', '\nabc\n'])
+def test_mime_data_newlines(nb, data):
+    cell = nbformat.v4.new_code_cell()
+    cell.outputs.append(
+        nbformat.v4.new_output('display_data', data={'text/plain': data}))
+    nb.cells.append(cell)
+    nb = deserialize(serialize(nb))
+    assert nb.cells[0].outputs[0].data['text/plain'] == data